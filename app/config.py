@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Literal
 
 
 class Settings(BaseSettings):
@@ -7,12 +8,24 @@ class Settings(BaseSettings):
     
     # App settings
     app_name: str = "Void Tax System"
-    debug: bool = True
+    debug: bool = False
+    workers: int = 1  # Uvicorn worker processes when not in debug (each loads its own models)
     
     # Scanning settings
     scan_interval_ms: int = 1000  # Frontend frame send interval (1 second for better performance)
     cache_cooldown_min: int = 5  # Minutes before re-checking same plate
     ocr_confidence_min: float = 0.5  # Minimum OCR confidence threshold (lowered for demo)
+    ocr_max_batch: int = 8  # Max frames per batched YOLO forward pass
+    ocr_batch_timeout_ms: float = 5.0  # How long to wait for more frames before running a batch
+    ocr_fast_mode: bool = False  # Always decode frames at half resolution (faster, less detail)
+    ocr_workers: int = 2  # OCR worker threads sharing the GPU, each on its own CUDA stream
+    max_gpu_inflight: int = 2  # Max frames on the GPU at once (bounds VRAM use)
+    
+    # Plate detector settings
+    plate_detector_precision: Literal["fp32", "fp16", "int8"] = "fp16"  # TensorRT precision on CUDA; fp32 skips TensorRT
+    plate_detector_calib_data: str = ""  # Dataset YAML of plate scenes for INT8 calibration
+    plate_detector_int8_min_map50: float = 0.8  # Reject the INT8 engine below this mAP50
+    preprocess_denoise: Literal["none", "gauss", "bilateral", "nlm"] = "gauss"  # Plate denoise before Otsu
     
     # External API settings
     external_api_url: str = "http://localhost:8001/api"
@@ -20,6 +33,11 @@ class Settings(BaseSettings):
     
     # Database settings
     database_url: str = "sqlite+aiosqlite:///./void_tax.db"
+    db_pool_size: int = 10  # Persistent pooled connections
+    db_max_overflow: int = 5  # Extra connections allowed under burst load
+    debug_sql: bool = False  # Log every SQL statement (slow; enable only when debugging queries)
+    scan_log_flush_ms: int = 250  # Max delay before queued scan logs are committed
+    scan_log_batch_size: int = 50  # Commit early once this many scan logs are queued
     
     # Fine settings
     road_tax_fine_amount: float = 150.00
@@ -1,45 +1,60 @@
 from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import os
 
+import cv2
+
 from app.config import get_settings
+from app.middleware import FastCORS
 from app.models.database import init_db
 from app.routers import scan, fines
+from app.services.fine_service import fine_service
+from app.services.ocr_service import ocr_service
+from app.services.plate_cache import plate_cache
+from app.services.validation_api import validation_api
 
 settings = get_settings()
 
+# One OpenCV thread per call: requests already run in parallel on the
+# executors, and OpenCV's own pool would multiply across them
+cv2.setNumThreads(1)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events."""
     # Startup
     await init_db()
+    await validation_api.start()
+    await fine_service.start_scan_log_writer()
+    await ocr_service.start_batching()
+    await plate_cache.start_cleanup()
     print(f"🚗 {settings.app_name} started!")
     print(f"📡 External API: {settings.external_api_url}")
     print(f"⏱️  Cache cooldown: {settings.cache_cooldown_min} minutes")
     yield
     # Shutdown
     print("👋 Shutting down...")
+    await plate_cache.stop_cleanup()
+    await ocr_service.stop_batching()
+    await fine_service.stop_scan_log_writer()
+    await fine_service.drain_notifications()
+    await validation_api.close()
 
 
 app = FastAPI(
     title=settings.app_name,
     description="Real-time car plate scanning system for road tax and insurance verification",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# CORS middleware (pure ASGI, allows any origin)
+app.add_middleware(FastCORS)
 
 # Get the project root directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,47 @@
+"""
+Lightweight pure-ASGI middleware.
+Avoids building Starlette Request/Response objects on every request.
+"""
+
+_ALLOW_ORIGIN = (b"access-control-allow-origin", b"*")
+_ALLOW_METHODS = (b"access-control-allow-methods", b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT")
+_MAX_AGE = (b"access-control-max-age", b"600")
+
+
+class FastCORS:
+    """
+    Minimal CORS middleware that allows any origin.
+    Answers preflight requests directly and stamps the allow-origin
+    header on every other HTTP response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "OPTIONS":
+            request_headers = dict(scope["headers"])
+            if b"access-control-request-method" in request_headers:
+                await self._preflight(request_headers, send)
+                return
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [_ALLOW_ORIGIN]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+    async def _preflight(self, request_headers: dict, send) -> None:
+        """Respond to a CORS preflight without touching the app."""
+        headers = [_ALLOW_ORIGIN, _ALLOW_METHODS, _MAX_AGE, (b"content-length", b"0")]
+        requested = request_headers.get(b"access-control-request-headers")
+        if requested:
+            headers.append((b"access-control-allow-headers", requested))
+
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b""})
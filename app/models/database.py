@@ -1,7 +1,9 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, create_engine
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Index, create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from contextlib import asynccontextmanager
 from datetime import datetime
 
 from app.config import get_settings
@@ -23,6 +25,11 @@ class Fine(Base):
     paid = Column(Boolean, default=False)
     paid_at = Column(DateTime, nullable=True)
     
+    __table_args__ = (
+        # Serves "WHERE paid = ? ORDER BY issued_at DESC" without a sort step
+        Index("ix_fines_paid_issued", "paid", "issued_at"),
+    )
+    
     def __repr__(self):
         return f"<Fine(id={self.id}, plate={self.plate_number}, amount={self.fine_amount})>"
 
@@ -39,18 +46,59 @@ class ScanLog(Base):
     insurance_valid = Column(Boolean, nullable=True)
     fine_issued = Column(Boolean, default=False)
     cached_result = Column(Boolean, default=False)
+    
+    __table_args__ = (
+        # Plate history lookups ordered by scan time
+        Index("ix_scan_logs_plate_time", "plate_number", "scanned_at"),
+    )
 
 
 # Database engine and session
+# Long-lived connection pool so sessions reuse warm SQLite connections
+# instead of reconnecting (and replaying PRAGMAs) on every call.
 settings = get_settings()
-engine = create_async_engine(settings.database_url, echo=settings.debug)
+engine = create_async_engine(
+    settings.database_url,
+    echo=settings.debug_sql,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_pre_ping=True,
+    connect_args={"check_same_thread": False}
+)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+@event.listens_for(engine.sync_engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Apply SQLite tuning once per new pooled connection."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.close()
+
+
 async def init_db():
     """Initialize database tables."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        # create_all skips existing tables, so add any new indexes explicitly
+        await conn.run_sync(_create_missing_indexes)
+
+
+def _create_missing_indexes(sync_conn):
+    """Create indexes added after the tables were first created."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+@asynccontextmanager
+async def get_session():
+    """Get a session backed by the shared connection pool."""
+    async with AsyncSessionLocal() as session:
+        yield session
 
 
 async def get_db():
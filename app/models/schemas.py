@@ -1,7 +1,8 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
+from functools import cached_property
 
 
 class ComplianceStatus(str, Enum):
@@ -12,8 +13,20 @@ class ComplianceStatus(str, Enum):
     BOTH_EXPIRED = "both_expired"
 
 
+# Indexed by (road_tax_valid << 1) | insurance_valid
+_COMPLIANCE_BY_FLAGS = (
+    ComplianceStatus.BOTH_EXPIRED,
+    ComplianceStatus.TAX_EXPIRED,
+    ComplianceStatus.INSURANCE_EXPIRED,
+    ComplianceStatus.COMPLIANT,
+)
+
+
 class VehicleStatus(BaseModel):
     """Response from external validation API."""
+    # Frozen so the cached compliance properties can't go stale
+    model_config = ConfigDict(frozen=True)
+    
     plate_number: str
     owner_name: Optional[str] = None
     owner_id: Optional[str] = None
@@ -22,22 +35,18 @@ class VehicleStatus(BaseModel):
     insurance_valid: bool = True
     insurance_expiry: Optional[datetime] = None
     
-    @property
+    @cached_property
     def is_compliant(self) -> bool:
         """Check if vehicle is fully compliant."""
         return self.road_tax_valid and self.insurance_valid
     
-    @property
+    @cached_property
     def compliance_status(self) -> ComplianceStatus:
-        """Get detailed compliance status."""
-        if self.road_tax_valid and self.insurance_valid:
-            return ComplianceStatus.COMPLIANT
-        elif not self.road_tax_valid and not self.insurance_valid:
-            return ComplianceStatus.BOTH_EXPIRED
-        elif not self.road_tax_valid:
-            return ComplianceStatus.TAX_EXPIRED
-        else:
-            return ComplianceStatus.INSURANCE_EXPIRED
+        """
+        Get detailed compliance status.
+        Computed once per instance; cached results are shared via PlateCache.
+        """
+        return _COMPLIANCE_BY_FLAGS[(self.road_tax_valid << 1) | self.insurance_valid]
 
 
 class PlateDetection(BaseModel):
@@ -77,8 +86,7 @@ class FineRecord(BaseModel):
     issued_at: datetime = Field(default_factory=datetime.now)
     paid: bool = False
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class CacheStats(BaseModel):
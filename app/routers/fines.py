@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional
 
 from app.models.schemas import FineRecord
@@ -18,8 +19,11 @@ async def get_fines(
     Args:
         limit: Maximum number of records to return (1-1000)
         unpaid_only: If true, return only unpaid fines
+    
+    Rows are serialized directly with orjson; response_model is kept for docs only.
     """
-    return await fine_service.get_fines(limit=limit, unpaid_only=unpaid_only)
+    fines = await fine_service.get_fines(limit=limit, unpaid_only=unpaid_only)
+    return ORJSONResponse(fines)
 
 
 @router.get("/fines/plate/{plate_number}", response_model=List[FineRecord])
@@ -27,7 +31,8 @@ async def get_fines_by_plate(plate_number: str):
     """
     Get all fines for a specific plate number.
     """
-    return await fine_service.get_fine_by_plate(plate_number)
+    fines = await fine_service.get_fine_by_plate(plate_number)
+    return ORJSONResponse(fines)
 
 
 @router.post("/fines/{fine_id}/pay")
@@ -48,24 +53,4 @@ async def get_fines_summary():
     """
     Get summary statistics for fines.
     """
-    all_fines = await fine_service.get_fines(limit=10000)
-    unpaid_fines = [f for f in all_fines if not f.paid]
-    
-    total_amount = sum(f.fine_amount for f in all_fines)
-    unpaid_amount = sum(f.fine_amount for f in unpaid_fines)
-    
-    # Count by type
-    type_counts = {}
-    for fine in all_fines:
-        type_counts[fine.fine_type] = type_counts.get(fine.fine_type, 0) + 1
-    
-    return {
-        "total_fines": len(all_fines),
-        "unpaid_fines": len(unpaid_fines),
-        "paid_fines": len(all_fines) - len(unpaid_fines),
-        "total_amount": total_amount,
-        "unpaid_amount": unpaid_amount,
-        "collected_amount": total_amount - unpaid_amount,
-        "fines_by_type": type_counts
-    }
-
+    return await fine_service.get_summary()
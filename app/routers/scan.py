@@ -1,23 +1,29 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse, Response
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
 from pydantic import BaseModel
 from typing import Optional, List
 import time
-import base64
-import cv2
-import numpy as np
+from datetime import datetime
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 
-from app.models.schemas import ScanFrameResponse, ScanResult, CacheStats
+from app.models.schemas import ScanFrameResponse, ScanResult, CacheStats, PlateDetection
 from app.services.ocr_service import ocr_service
 from app.services.plate_cache import plate_cache
 from app.services.validation_api import validation_api
 from app.services.fine_service import fine_service
 from app.services.plate_detector import plate_detector
+from app.utils.image_processor import decode_and_resize, decode_base64_image, encode_base64_image, encode_jpeg
+from app.utils.plate_utils import normalize_plate
 from app.config import get_settings
 
 router = APIRouter()
 settings = get_settings()
 
+# Dedicated pool for CPU-bound OpenCV work so it doesn't block the event loop
+_image_executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+
 
 class Base64ImageRequest(BaseModel):
     """Request body for base64 image scan."""
@@ -44,44 +50,40 @@ async def scan_frame(file: UploadFile = File(...)):
         image_data = await file.read()
         
         if not image_data:
-            return ScanFrameResponse(
+            return _frame_response(ScanFrameResponse(
                 success=False,
                 plates_detected=0,
                 results=[],
                 processing_time_ms=0
-            )
+            ))
         
         # Detect plates using OCR
         plates = await ocr_service.detect_plates(image_data)
         
         if not plates:
-            return ScanFrameResponse(
+            return _frame_response(ScanFrameResponse(
                 success=True,
                 plates_detected=0,
                 results=[],
                 processing_time_ms=(time.time() - start_time) * 1000
-            )
-        
-        results = []
+            ))
         
-        for plate in plates:
-            result = await _process_plate(plate.plate_number, plate.confidence)
-            results.append(result)
+        results = await _process_plates(plates)
         
-        return ScanFrameResponse(
+        return _frame_response(ScanFrameResponse(
             success=True,
             plates_detected=len(plates),
             results=results,
             processing_time_ms=(time.time() - start_time) * 1000
-        )
+        ))
         
     except Exception as e:
-        return ScanFrameResponse(
+        return _frame_response(ScanFrameResponse(
             success=False,
             plates_detected=0,
             results=[],
             processing_time_ms=(time.time() - start_time) * 1000
-        )
+        ))
 
 
 @router.post("/scan-frame-base64", response_model=ScanFrameResponse)
@@ -97,34 +99,86 @@ async def scan_frame_base64(request: Base64ImageRequest):
         plates = await ocr_service.detect_plates_from_base64(request.image)
         
         if not plates:
-            return ScanFrameResponse(
+            return _frame_response(ScanFrameResponse(
                 success=True,
                 plates_detected=0,
                 results=[],
                 processing_time_ms=(time.time() - start_time) * 1000
-            )
+            ))
         
-        results = []
+        results = await _process_plates(plates)
         
-        for plate in plates:
-            result = await _process_plate(plate.plate_number, plate.confidence)
-            results.append(result)
-        
-        return ScanFrameResponse(
+        return _frame_response(ScanFrameResponse(
             success=True,
             plates_detected=len(plates),
             results=results,
             processing_time_ms=(time.time() - start_time) * 1000
-        )
+        ))
         
     except Exception as e:
         print(f"Error processing frame: {e}")
-        return ScanFrameResponse(
+        return _frame_response(ScanFrameResponse(
             success=False,
             plates_detected=0,
             results=[],
             processing_time_ms=(time.time() - start_time) * 1000
-        )
+        ))
+
+
+def _frame_response(response: ScanFrameResponse) -> ORJSONResponse:
+    """
+    Serialize an already-built ScanFrameResponse directly.
+    Returning a Response skips FastAPI's response_model revalidation and
+    jsonable_encoder pass; response_model stays on the routes for docs.
+    """
+    return ORJSONResponse(response.model_dump(mode="json"))
+
+
+async def _process_plates(plates: List[PlateDetection]) -> List[ScanResult]:
+    """
+    Process all plates detected in a frame concurrently.
+    Repeated plates (e.g. overlapping YOLO boxes) are looked up once, using
+    the highest-confidence detection, so they can't race past the cache into
+    duplicate API calls and fines. The other detections of that plate get
+    the result back as a cache hit, as if processed one after another.
+    """
+    best = {}
+    for i, plate in enumerate(plates):
+        key = normalize_plate(plate.plate_number)
+        if key not in best or plate.confidence > plates[best[key]].confidence:
+            best[key] = i
+    
+    unique = list(best.values())
+    outcomes = await asyncio.gather(
+        *(_process_plate(plates[i].plate_number, plates[i].confidence) for i in unique),
+        return_exceptions=True
+    )
+    
+    by_key = {}
+    for i, outcome in zip(unique, outcomes):
+        plate = plates[i]
+        if isinstance(outcome, BaseException):
+            print(f"❌ Error processing {plate.plate_number}: {outcome}")
+            outcome = ScanResult(
+                plate_number=plate.plate_number,
+                confidence=plate.confidence,
+                cached=False,
+                vehicle_status=None,
+                fine_issued=False,
+                error=str(outcome)
+            )
+        by_key[normalize_plate(plate.plate_number)] = (i, outcome)
+    
+    results = []
+    for i, plate in enumerate(plates):
+        processed_index, outcome = by_key[normalize_plate(plate.plate_number)]
+        if i != processed_index:
+            update = {"plate_number": plate.plate_number, "confidence": plate.confidence}
+            if outcome.error is None:
+                update.update(cached=True, fine_issued=False, fine_amount=None)
+            outcome = outcome.model_copy(update=update)
+        results.append(outcome)
+    return results
 
 
 async def _process_plate(plate_number: str, confidence: float) -> ScanResult:
@@ -136,6 +190,9 @@ async def _process_plate(plate_number: str, confidence: float) -> ScanResult:
     # Minimum confidence to issue a fine
     MIN_FINE_CONFIDENCE = 0.9
     
+    # One timestamp shared by every row written for this plate
+    now = datetime.now()
+    
     # Check if plate was recently scanned
     cached_status = plate_cache.get_cached_result(plate_number)
     
@@ -162,19 +219,19 @@ async def _process_plate(plate_number: str, confidence: float) -> ScanResult:
         fine_record = None
         if not vehicle_status.is_compliant and confidence >= MIN_FINE_CONFIDENCE:
             print(f"💰 Issuing fine for {plate_number} (confidence: {confidence:.2f})")
-            fine_record = await fine_service.issue_fine(vehicle_status, confidence)
+            fine_record = await fine_service.issue_fine(vehicle_status, confidence, now=now)
         elif not vehicle_status.is_compliant:
             print(f"⚠️ Low confidence ({confidence:.2f}) - skipping fine for {plate_number}")
             # Log but don't fine
             await fine_service.log_scan(
                 plate_number, confidence, vehicle_status, 
-                cached=False, fine_issued=False
+                cached=False, fine_issued=False, now=now
             )
         else:
             # Log compliant scan
             await fine_service.log_scan(
                 plate_number, confidence, vehicle_status, 
-                cached=False, fine_issued=False
+                cached=False, fine_issued=False, now=now
             )
         
         return ScanResult(
@@ -238,13 +295,13 @@ async def debug_detection(request: DebugImageRequest):
     """
     try:
         # Decode base64 image
-        image_data = request.image
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]
+        image_bytes = decode_base64_image(request.image)
         
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Decode + resize off the event loop
+        loop = asyncio.get_running_loop()
+        image = await loop.run_in_executor(
+            _image_executor, decode_and_resize, image_bytes, 800, 600
+        )
         
         if image is None:
             return DebugResponse(
@@ -253,22 +310,18 @@ async def debug_detection(request: DebugImageRequest):
                 regions=[]
             )
         
-        # Resize for processing
-        max_width, max_height = 800, 600
-        height, width = image.shape[:2]
-        if width > max_width or height > max_height:
-            scale = min(max_width / width, max_height / height)
-            image = cv2.resize(image, (int(width * scale), int(height * scale)))
-        
-        # Get YOLOv8's native visualization
-        debug_image, num_detections = plate_detector.get_yolo_visualization(image)
+        # Get YOLOv8's native visualization (off the loop: inference waits on
+        # the detector lock while OCR workers run their own passes)
+        debug_image, num_detections = await loop.run_in_executor(
+            _image_executor, plate_detector.get_yolo_visualization, image
+        )
         
         # Also get regions for info display
-        regions = plate_detector.detect(image)
+        regions = await loop.run_in_executor(_image_executor, plate_detector.detect, image)
         
         # Convert back to base64
-        _, buffer = cv2.imencode('.jpg', debug_image)
-        debug_base64 = base64.b64encode(buffer).decode('utf-8')
+        buffer = await loop.run_in_executor(_image_executor, encode_jpeg, debug_image)
+        debug_base64 = encode_base64_image(buffer)
         
         # Format region info
         region_info = [
@@ -306,7 +359,6 @@ async def test_fine():
     Test endpoint: Create a mock fine for UI testing.
     """
     from app.models.schemas import VehicleStatus
-    from datetime import datetime
     
     # Create a mock vehicle status
     mock_vehicle = VehicleStatus(
@@ -1,15 +1,29 @@
+import asyncio
 from datetime import datetime
-from typing import List, Optional
-from sqlalchemy import select
+from typing import List, Optional, Set
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import get_settings
-from app.models.database import Fine, ScanLog, AsyncSessionLocal
+from app.models.database import Fine, ScanLog, get_session
 from app.models.schemas import VehicleStatus, FineRecord, ComplianceStatus
 from app.services.validation_api import validation_api
+from app.utils.plate_utils import normalize_plate
 
 settings = get_settings()
 
+# Columns selected for list endpoints; keys match the FineRecord fields
+FINE_RECORD_COLUMNS = (
+    Fine.id,
+    Fine.plate_number,
+    Fine.owner_name,
+    Fine.owner_id,
+    Fine.fine_type,
+    Fine.fine_amount,
+    Fine.issued_at,
+    Fine.paid
+)
+
 
 class FineService:
     """
@@ -19,6 +33,21 @@ class FineService:
     def __init__(self):
         self._road_tax_fine = settings.road_tax_fine_amount
         self._insurance_fine = settings.insurance_fine_amount
+        # (fine_amount, fine_type) per compliance status
+        self._fine_table = {
+            ComplianceStatus.BOTH_EXPIRED: (self._road_tax_fine + self._insurance_fine, "both"),
+            ComplianceStatus.TAX_EXPIRED: (self._road_tax_fine, "road_tax"),
+            ComplianceStatus.INSURANCE_EXPIRED: (self._insurance_fine, "insurance"),
+            ComplianceStatus.COMPLIANT: (0.0, "none"),
+        }
+        # Strong refs to fire-and-forget notification tasks so they aren't GC'd
+        self._pending_notifications: Set[asyncio.Task] = set()
+        
+        # Write-behind queue for ScanLog rows (Fine rows are still committed inline)
+        self._scan_log_queue: asyncio.Queue = asyncio.Queue()
+        self._scan_log_task: Optional[asyncio.Task] = None
+        self._scan_log_flush_s = settings.scan_log_flush_ms / 1000
+        self._scan_log_batch_size = settings.scan_log_batch_size
     
     def calculate_fine(self, vehicle_status: VehicleStatus) -> tuple[float, str]:
         """
@@ -27,21 +56,13 @@ class FineService:
         Returns:
             Tuple of (fine_amount, fine_type)
         """
-        status = vehicle_status.compliance_status
-        
-        if status == ComplianceStatus.BOTH_EXPIRED:
-            return self._road_tax_fine + self._insurance_fine, "both"
-        elif status == ComplianceStatus.TAX_EXPIRED:
-            return self._road_tax_fine, "road_tax"
-        elif status == ComplianceStatus.INSURANCE_EXPIRED:
-            return self._insurance_fine, "insurance"
-        else:
-            return 0.0, "none"
+        return self._fine_table[vehicle_status.compliance_status]
     
     async def issue_fine(
         self, 
         vehicle_status: VehicleStatus,
-        confidence: float = 1.0
+        confidence: float = 1.0,
+        now: Optional[datetime] = None
     ) -> Optional[FineRecord]:
         """
         Issue a fine for a non-compliant vehicle.
@@ -49,6 +70,7 @@ class FineService:
         Args:
             vehicle_status: The vehicle's validation status
             confidence: OCR confidence score
+            now: Timestamp for the fine and scan log (defaults to current time)
             
         Returns:
             FineRecord if fine was issued, None otherwise
@@ -61,35 +83,38 @@ class FineService:
         if fine_amount == 0:
             return None
         
-        async with AsyncSessionLocal() as session:
+        now = now or datetime.now()
+        # Store canonical plates so lookups are a direct index hit
+        plate_number = normalize_plate(vehicle_status.plate_number)
+        
+        async with get_session() as session:
             # Create fine record
             fine = Fine(
-                plate_number=vehicle_status.plate_number,
+                plate_number=plate_number,
                 owner_name=vehicle_status.owner_name,
                 owner_id=vehicle_status.owner_id,
                 fine_type=fine_type,
                 fine_amount=fine_amount,
-                issued_at=datetime.now()
+                issued_at=now
             )
-            session.add(fine)
             
             # Create scan log
             scan_log = ScanLog(
-                plate_number=vehicle_status.plate_number,
-                scanned_at=datetime.now(),
+                plate_number=plate_number,
+                scanned_at=now,
                 confidence=confidence,
                 road_tax_valid=vehicle_status.road_tax_valid,
                 insurance_valid=vehicle_status.insurance_valid,
                 fine_issued=True,
                 cached_result=False
             )
-            session.add(scan_log)
+            session.add_all([fine, scan_log])
             
             await session.commit()
             await session.refresh(fine)
             
-            # Notify external API (non-blocking)
-            await validation_api.notify_fine(
+            # Notify external API in the background so the scan isn't blocked
+            self._notify_in_background(
                 vehicle_status.plate_number, 
                 fine_amount, 
                 fine_type
@@ -106,33 +131,111 @@ class FineService:
                 paid=fine.paid
             )
     
+    def _notify_in_background(self, plate_number: str, fine_amount: float, fine_type: str) -> None:
+        """Fire off the external fine notification without awaiting it."""
+        task = asyncio.create_task(
+            validation_api.notify_fine(plate_number, fine_amount, fine_type)
+        )
+        self._pending_notifications.add(task)
+        task.add_done_callback(self._pending_notifications.discard)
+    
+    async def drain_notifications(self) -> None:
+        """Wait for any in-flight fine notifications to finish."""
+        if self._pending_notifications:
+            await asyncio.gather(*self._pending_notifications, return_exceptions=True)
+    
     async def log_scan(
         self,
         plate_number: str,
         confidence: float,
         vehicle_status: Optional[VehicleStatus],
         cached: bool = False,
-        fine_issued: bool = False
+        fine_issued: bool = False,
+        now: Optional[datetime] = None
     ) -> None:
-        """Log a scan event."""
-        async with AsyncSessionLocal() as session:
-            scan_log = ScanLog(
-                plate_number=plate_number,
-                scanned_at=datetime.now(),
-                confidence=confidence,
-                road_tax_valid=vehicle_status.road_tax_valid if vehicle_status else None,
-                insurance_valid=vehicle_status.insurance_valid if vehicle_status else None,
-                fine_issued=fine_issued,
-                cached_result=cached
-            )
-            session.add(scan_log)
-            await session.commit()
+        """
+        Log a scan event.
+        
+        While the background writer is running, the row is queued and
+        committed in a batch; otherwise it is written immediately.
+        """
+        now = now or datetime.now()
+        
+        row = {
+            "plate_number": normalize_plate(plate_number),
+            "scanned_at": now,
+            "confidence": confidence,
+            "road_tax_valid": vehicle_status.road_tax_valid if vehicle_status else None,
+            "insurance_valid": vehicle_status.insurance_valid if vehicle_status else None,
+            "fine_issued": fine_issued,
+            "cached_result": cached
+        }
+        
+        if self._scan_log_task is not None:
+            await self._scan_log_queue.put(row)
+        else:
+            await self._write_scan_logs([row])
+    
+    async def start_scan_log_writer(self) -> None:
+        """Start the background task that batches ScanLog inserts."""
+        if self._scan_log_task is None:
+            self._scan_log_task = asyncio.create_task(self._run_scan_log_writer())
+    
+    async def stop_scan_log_writer(self) -> None:
+        """Flush queued scan logs and stop the background writer."""
+        if self._scan_log_task is None:
+            return
+        await self._scan_log_queue.put(None)  # Sentinel: flush and exit
+        await self._scan_log_task
+        self._scan_log_task = None
+    
+    async def _run_scan_log_writer(self) -> None:
+        """
+        Drain the scan log queue, committing once per flush window or
+        once the batch is full, whichever comes first.
+        """
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            row = await self._scan_log_queue.get()
+            if row is None:
+                return
+            
+            batch = [row]
+            stop = False
+            deadline = loop.time() + self._scan_log_flush_s
+            
+            while len(batch) < self._scan_log_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._scan_log_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    stop = True
+                    break
+                batch.append(row)
+            
+            await self._write_scan_logs(batch)
+            if stop:
+                return
+    
+    async def _write_scan_logs(self, rows: List[dict]) -> None:
+        """Insert scan log rows in a single transaction."""
+        try:
+            async with get_session() as session:
+                session.add_all([ScanLog(**row) for row in rows])
+                await session.commit()
+        except Exception as e:
+            print(f"⚠️ Failed to write {len(rows)} scan log(s): {e}")
     
     async def get_fines(
         self, 
         limit: int = 100, 
         unpaid_only: bool = False
-    ) -> List[FineRecord]:
+    ) -> List[dict]:
         """
         Get list of fines.
         
@@ -141,60 +244,74 @@ class FineService:
             unpaid_only: If True, return only unpaid fines
             
         Returns:
-            List of FineRecord objects
+            List of fine dicts with the same fields as FineRecord
         """
-        async with AsyncSessionLocal() as session:
-            query = select(Fine).order_by(Fine.issued_at.desc()).limit(limit)
+        async with get_session() as session:
+            query = select(*FINE_RECORD_COLUMNS).order_by(Fine.issued_at.desc()).limit(limit)
             
             if unpaid_only:
                 query = query.where(Fine.paid == False)
             
             result = await session.execute(query)
-            fines = result.scalars().all()
-            
-            return [
-                FineRecord(
-                    id=f.id,
-                    plate_number=f.plate_number,
-                    owner_name=f.owner_name,
-                    owner_id=f.owner_id,
-                    fine_type=f.fine_type,
-                    fine_amount=f.fine_amount,
-                    issued_at=f.issued_at,
-                    paid=f.paid
-                )
-                for f in fines
-            ]
+            return [dict(row) for row in result.mappings()]
     
-    async def get_fine_by_plate(self, plate_number: str) -> List[FineRecord]:
+    async def get_fine_by_plate(self, plate_number: str) -> List[dict]:
         """Get all fines for a specific plate number."""
-        normalized = plate_number.upper().replace(" ", "").replace("-", "")
+        normalized = normalize_plate(plate_number)
         
-        async with AsyncSessionLocal() as session:
-            query = select(Fine).where(
+        async with get_session() as session:
+            query = select(*FINE_RECORD_COLUMNS).where(
                 Fine.plate_number == normalized
             ).order_by(Fine.issued_at.desc())
             
             result = await session.execute(query)
-            fines = result.scalars().all()
-            
-            return [
-                FineRecord(
-                    id=f.id,
-                    plate_number=f.plate_number,
-                    owner_name=f.owner_name,
-                    owner_id=f.owner_id,
-                    fine_type=f.fine_type,
-                    fine_amount=f.fine_amount,
-                    issued_at=f.issued_at,
-                    paid=f.paid
-                )
-                for f in fines
-            ]
+            return [dict(row) for row in result.mappings()]
+    
+    async def get_summary(self) -> dict:
+        """
+        Get summary statistics for fines.
+        
+        Aggregation is done in SQL, grouped by (fine_type, paid), so only a
+        handful of rows are returned regardless of how many fines exist.
+        """
+        async with get_session() as session:
+            query = select(
+                Fine.fine_type,
+                Fine.paid,
+                func.count(),
+                func.sum(Fine.fine_amount)
+            ).group_by(Fine.fine_type, Fine.paid)
+            
+            result = await session.execute(query)
+            
+            total_fines = 0
+            unpaid_fines = 0
+            total_amount = 0.0
+            unpaid_amount = 0.0
+            type_counts = {}
+            
+            for fine_type, paid, count, amount in result.all():
+                amount = amount or 0.0
+                total_fines += count
+                total_amount += amount
+                if not paid:
+                    unpaid_fines += count
+                    unpaid_amount += amount
+                type_counts[fine_type] = type_counts.get(fine_type, 0) + count
+            
+            return {
+                "total_fines": total_fines,
+                "unpaid_fines": unpaid_fines,
+                "paid_fines": total_fines - unpaid_fines,
+                "total_amount": total_amount,
+                "unpaid_amount": unpaid_amount,
+                "collected_amount": total_amount - unpaid_amount,
+                "fines_by_type": type_counts
+            }
     
     async def mark_fine_paid(self, fine_id: int) -> bool:
         """Mark a fine as paid."""
-        async with AsyncSessionLocal() as session:
+        async with get_session() as session:
             query = select(Fine).where(Fine.id == fine_id)
             result = await session.execute(query)
             fine = result.scalar_one_or_none()
@@ -7,16 +7,19 @@ OCR Service with two-stage detection:
 import easyocr
 import numpy as np
 import cv2
-import base64
 import re
-from typing import List, Optional
+import string
+from typing import List, Optional, Tuple
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import asyncio
+import threading
 import torch
 
 from app.config import get_settings
 from app.models.schemas import PlateDetection
 from app.services.plate_detector import plate_detector
+from app.utils.image_processor import decode_base64_image, decode_image
 
 settings = get_settings()
 
@@ -42,94 +45,223 @@ class OCRService:
     
     def __init__(self):
         self._reader: Optional[easyocr.Reader] = None
-        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._reader_lock = threading.Lock()
         self._min_confidence = settings.ocr_confidence_min
         self._use_gpu = check_gpu_availability()
+        self._use_cuda = self._use_gpu and torch.cuda.is_available()
+        
+        # A few workers share one Reader; each gets its own CUDA stream so one
+        # worker's OCR can run alongside another's (serialized) YOLO pass
+        self._workers = max(1, settings.ocr_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self._workers)
+        self._gpu_slots = threading.BoundedSemaphore(max(1, settings.max_gpu_inflight))
+        self._thread_local = threading.local()
+        
+        # Common size plate crops are resized to for batched OCR
+        self._plate_ocr_width = 240
+        self._plate_ocr_height = 80
+        # YOLO crops smaller than this (in pixels) are too small to read
+        self._min_region_area = 400
+        
+        # Micro-batching of concurrent frames
+        self._batch_queue: asyncio.Queue = asyncio.Queue()
+        self._batch_task: Optional[asyncio.Task] = None
+        self._max_batch = settings.ocr_max_batch
+        self._batch_timeout_s = settings.ocr_batch_timeout_ms / 1000
         
         # Target size for processing
         self._max_width = 800
         self._max_height = 600
+        self._fast_decode = settings.ocr_fast_mode
         
-        # Plate patterns (Malaysian format)
+        # Plate patterns (Malaysian format), compiled once into a single
+        # alternation that is matched against the whole string
         self._plate_patterns = [
-            r'^[A-Z]{1,3}\s?\d{1,4}[A-Z]?$',
-            r'^[A-Z]{1,3}\d{1,4}$',
-            r'^\d{1,4}[A-Z]{1,3}$',
-            r'^[A-Z]{2}\s?\d{4}\s?[A-Z]{2}$',
+            r'[A-Z]{1,3}\s?\d{1,4}[A-Z]?',
+            r'[A-Z]{1,3}\d{1,4}',
+            r'\d{1,4}[A-Z]{1,3}',
+            r'[A-Z]{2}\s?\d{4}\s?[A-Z]{2}',
         ]
+        self._plate_re = re.compile('|'.join(f'(?:{p})' for p in self._plate_patterns))
+        self._strip_re = re.compile(r'[^A-Z0-9\s]')
+        self._letters = frozenset(string.ascii_uppercase)
+        self._digits = frozenset(string.digits)
     
     def _get_reader(self) -> easyocr.Reader:
         """Lazy initialization of EasyOCR reader."""
         if self._reader is None:
-            print("🔄 Initializing EasyOCR reader...")
-            self._reader = easyocr.Reader(['en'], gpu=self._use_gpu and torch.cuda.is_available())
-            print("✅ EasyOCR reader initialized")
+            with self._reader_lock:
+                if self._reader is None:
+                    print("🔄 Initializing EasyOCR reader...")
+                    reader = easyocr.Reader(['en'], gpu=self._use_cuda, cudnn_benchmark=self._use_cuda)
+                    
+                    if self._use_cuda:
+                        # Warm up so cuDNN locks in its algorithm choice for plate-sized batches
+                        reader.readtext_batched(
+                            np.zeros((4, self._plate_ocr_height, self._plate_ocr_width, 3), np.uint8)
+                        )
+                    self._reader = reader
+                    print("✅ EasyOCR reader initialized")
         return self._reader
     
-    def _resize_image(self, image: np.ndarray) -> np.ndarray:
-        """Resize image for processing."""
+    @contextmanager
+    def _gpu_slot(self):
+        """
+        Hold one of the max_gpu_inflight GPU slots, running on this worker
+        thread's own CUDA stream when on CUDA.
+        """
+        with self._gpu_slots:
+            if not self._use_cuda:
+                yield
+                return
+            stream = getattr(self._thread_local, 'stream', None)
+            if stream is None:
+                stream = self._thread_local.stream = torch.cuda.Stream()
+            with torch.cuda.stream(stream):
+                yield
+            stream.synchronize()
+    
+    def _resize_image(self, image: np.ndarray, slot: int = 0) -> np.ndarray:
+        """
+        Resize image for processing.
+        The result is a view into a per-thread scratch buffer (one per batch
+        slot), so it is only valid until this thread resizes into that slot again.
+        """
         height, width = image.shape[:2]
         if width <= self._max_width and height <= self._max_height:
             return image
         scale = min(self._max_width / width, self._max_height / height)
         new_width = int(width * scale)
         new_height = int(height * scale)
-        return cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
-    
-    def _is_valid_plate(self, text: str) -> bool:
-        """Check if detected text matches car plate patterns."""
-        cleaned = text.upper().strip()
-        cleaned = re.sub(r'[^A-Z0-9\s]', '', cleaned)
         
-        if len(cleaned) < 2:
-            return False
+        if image.ndim != 3 or image.shape[2] != 3:
+            return cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
         
-        for pattern in self._plate_patterns:
-            if re.match(pattern, cleaned):
-                return True
+        buffers = getattr(self._thread_local, 'resize_buffers', None)
+        if buffers is None:
+            buffers = self._thread_local.resize_buffers = {}
+        buf = buffers.get(slot)
+        if buf is None:
+            buf = buffers[slot] = np.empty((self._max_height, self._max_width, 3), dtype=np.uint8)
         
-        # Lenient: accept any text with letters + numbers, length >= 3
-        has_letters = bool(re.search(r'[A-Z]', cleaned))
-        has_numbers = bool(re.search(r'\d', cleaned))
-        return has_letters and has_numbers and len(cleaned) >= 3
+        view = buf[:new_height, :new_width]
+        cv2.resize(image, (new_width, new_height), dst=view, interpolation=cv2.INTER_AREA)
+        return view
+    
+    def _is_valid_plate(self, text: str) -> bool:
+        """Check if detected text matches car plate patterns."""
+        return self._check_plate(self._strip_re.sub('', text.upper().strip()))
     
     def _clean_plate_text(self, text: str) -> str:
         """Clean and normalize detected plate text."""
-        cleaned = re.sub(r'[^A-Z0-9\s]', '', text.upper())
+        cleaned = self._strip_re.sub('', text.upper())
         cleaned = ' '.join(cleaned.split())
         return cleaned
     
+    def _clean_and_validate(self, text: str) -> Tuple[str, bool]:
+        """
+        Clean OCR text and validate it in one pass.
+        The cleaned text is already stripped, so validation skips the second sweep.
+        """
+        cleaned = self._clean_plate_text(text)
+        return cleaned, self._check_plate(cleaned)
+    
+    def _check_plate(self, cleaned: str) -> bool:
+        """Validate already-cleaned plate text."""
+        if len(cleaned) < 2:
+            return False
+        
+        if self._plate_re.fullmatch(cleaned):
+            return True
+        
+        # Lenient: accept any text with letters + numbers, length >= 3
+        return (
+            len(cleaned) >= 3
+            and not self._letters.isdisjoint(cleaned)
+            and not self._digits.isdisjoint(cleaned)
+        )
+    
     def _detect_plates_sync(self, image: np.ndarray) -> List[PlateDetection]:
         """
         Two-stage plate detection:
-        1. Use OpenCV to find plate regions
+        1. Use YOLOv8 to find plate regions
         2. Run OCR only on those regions
         """
-        reader = self._get_reader()
         image = self._resize_image(image)
-        results = []
         
-        # Stage 1: Detect plate regions using OpenCV
-        plate_regions = plate_detector.detect(image)
+        with self._gpu_slot():
+            # Stage 1: Detect plate regions using YOLOv8
+            plate_regions = plate_detector.detect(image)
+            
+            return self._read_plates(image, plate_regions)
+    
+    def _decode_image(self, image_data: bytes) -> Optional[np.ndarray]:
+        """Decode frame bytes, at reduced resolution when that still fits the target size."""
+        return decode_image(image_data, self._max_width, self._max_height, fast=self._fast_decode)
+    
+    def _decode_and_detect_sync(self, image_data: bytes) -> List[PlateDetection]:
+        """Decode a frame and run two-stage detection on it."""
+        image = self._decode_image(image_data)
+        if image is None:
+            return []
+        return self._detect_plates_sync(image)
+    
+    def _detect_plates_batch_sync(self, batch_data: List[bytes]) -> List[List[PlateDetection]]:
+        """
+        Batched version of _decode_and_detect_sync: one YOLOv8 forward pass
+        for all decodable frames, then OCR per image.
+        """
+        decoded = [self._decode_image(image_data) for image_data in batch_data]
+        valid = [i for i, image in enumerate(decoded) if image is not None]
+        
+        images = [self._resize_image(decoded[i], slot) for slot, i in enumerate(valid)]
+        
+        results: List[List[PlateDetection]] = [[] for _ in batch_data]
+        with self._gpu_slot():
+            batch_regions = plate_detector.detect_batch(images)
+            for i, image, plate_regions in zip(valid, images, batch_regions):
+                results[i] = self._read_plates(image, plate_regions)
+        return results
+    
+    def _readtext(self, reader: easyocr.Reader, image: np.ndarray) -> list:
+        """Single-image OCR returning (bbox, text, confidence) per text region."""
+        return reader.readtext(image, detail=1, paragraph=False)
+    
+    def _read_plates(self, image: np.ndarray, plate_regions: list) -> List[PlateDetection]:
+        """Stage 2: Run OCR on detected regions, or the whole image if none."""
+        reader = self._get_reader()
+        results = []
         
         if plate_regions:
             print(f"🔍 YOLOv8 detected {len(plate_regions)} potential plate region(s)")
+        
+        # Skip crops too small for OCR to read anything useful; if that leaves
+        # nothing, fall through to the whole-image scan
+        plate_regions = [
+            region for region in plate_regions
+            if region.width * region.height >= self._min_region_area
+        ]
+        
+        if plate_regions:
+            # Stage 2: Run OCR on the cropped plate regions, batched when there
+            # are several (a single crop is faster through plain readtext)
+            if len(plate_regions) > 1:
+                batch_ocr_results = reader.readtext_batched(
+                    [region.image for region in plate_regions],
+                    n_width=self._plate_ocr_width,
+                    n_height=self._plate_ocr_height
+                )
+            else:
+                batch_ocr_results = [self._readtext(reader, plate_regions[0].image)]
             
-            # Stage 2: Run OCR on each detected region
-            for i, region in enumerate(plate_regions):
-                # Preprocess the plate region for better OCR
-                preprocessed = plate_detector.preprocess_plate(region.image)
-                
-                # Run OCR on the cropped plate region
-                ocr_results = reader.readtext(region.image)
-                
-                # Also try on preprocessed version
+            for i, (region, ocr_results) in enumerate(zip(plate_regions, batch_ocr_results)):
+                # Retry on a preprocessed version only when the raw crop found nothing
                 if not ocr_results:
-                    ocr_results = reader.readtext(preprocessed)
+                    preprocessed = plate_detector.preprocess_plate(region.image)
+                    ocr_results = self._readtext(reader, preprocessed)
                 
                 for (bbox, text, confidence) in ocr_results:
-                    cleaned_text = self._clean_plate_text(text)
-                    is_valid = self._is_valid_plate(cleaned_text)
+                    cleaned_text, is_valid = self._clean_and_validate(text)
                     
                     print(f"   📝 Region {i+1}: '{text}' → '{cleaned_text}' (conf: {confidence:.2f}, valid: {is_valid})")
                     
@@ -144,16 +276,15 @@ class OCRService:
                                          [region.x, region.y + region.height]]
                         ))
         else:
-            # Fallback: If no plate regions detected, scan whole image
+            # Fallback: If no usable plate regions detected, scan whole image
             print("⚠️ No plate regions found, scanning whole image...")
-            ocr_results = reader.readtext(image)
+            ocr_results = self._readtext(reader, image)
             
             if ocr_results:
                 print(f"📷 OCR found {len(ocr_results)} text regions in full image:")
                 
             for (bbox, text, confidence) in ocr_results:
-                cleaned_text = self._clean_plate_text(text)
-                is_valid = self._is_valid_plate(cleaned_text)
+                cleaned_text, is_valid = self._clean_and_validate(text)
                 status = "✅" if (confidence >= self._min_confidence and is_valid) else "❌"
                 print(f"   {status} '{text}' → '{cleaned_text}' (conf: {confidence:.2f})")
                 
@@ -168,26 +299,102 @@ class OCRService:
         return results
     
     async def detect_plates(self, image_data: bytes) -> List[PlateDetection]:
-        """Detect and read car plates from image data."""
-        nparr = np.frombuffer(image_data, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            return []
+        """
+        Detect and read car plates from image data.
+        Decoding happens on the worker thread together with detection,
+        keeping JPEG decode off the event loop.
+        """
+        # Coalesce with other in-flight frames when the batcher is running
+        if self._batch_task is not None:
+            future = asyncio.get_running_loop().create_future()
+            await self._batch_queue.put((image_data, future))
+            return await future
         
         loop = asyncio.get_event_loop()
         results = await loop.run_in_executor(
             self._executor,
-            self._detect_plates_sync,
-            image
+            self._decode_and_detect_sync,
+            image_data
         )
         return results
     
+    async def start_batching(self) -> None:
+        """Start the background task that micro-batches YOLO inference."""
+        if self._batch_task is None:
+            self._batch_task = asyncio.create_task(self._run_batcher())
+    
+    async def stop_batching(self) -> None:
+        """Finish queued frames and stop the batcher."""
+        if self._batch_task is None:
+            return
+        await self._batch_queue.put(None)  # Sentinel: finish and exit
+        await self._batch_task
+        self._batch_task = None
+    
+    async def _run_batcher(self) -> None:
+        """
+        Collect frames for up to batch_timeout (or max_batch frames) and hand
+        each batch to a free OCR worker, keeping up to ocr_workers batches
+        in flight.
+        """
+        loop = asyncio.get_running_loop()
+        free_workers = asyncio.Semaphore(self._workers)
+        in_flight = set()
+        stop = False
+        
+        while not stop:
+            item = await self._batch_queue.get()
+            if item is None:
+                break
+            
+            batch = [item]
+            deadline = loop.time() + self._batch_timeout_s
+            
+            while len(batch) < self._max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._batch_queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            
+            await free_workers.acquire()
+            task = asyncio.create_task(self._run_batch(batch, free_workers))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        
+        if in_flight:
+            await asyncio.gather(*in_flight)
+    
+    async def _run_batch(self, batch: list, free_workers: asyncio.Semaphore) -> None:
+        """Run one batch on the executor and resolve its callers' futures."""
+        loop = asyncio.get_running_loop()
+        batch_data = [image_data for image_data, _ in batch]
+        try:
+            batch_results = await loop.run_in_executor(
+                self._executor,
+                self._detect_plates_batch_sync,
+                batch_data
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), results in zip(batch, batch_results):
+                if not future.done():
+                    future.set_result(results)
+        finally:
+            free_workers.release()
+    
     async def detect_plates_from_base64(self, base64_data: str) -> List[PlateDetection]:
         """Detect plates from base64-encoded image."""
-        if ',' in base64_data:
-            base64_data = base64_data.split(',')[1]
-        image_bytes = base64.b64decode(base64_data)
+        image_bytes = decode_base64_image(base64_data)
         return await self.detect_plates(image_bytes)
 
 
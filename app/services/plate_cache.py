@@ -1,82 +1,84 @@
-from datetime import datetime, timedelta
-from typing import Dict, Optional, Any, Tuple
-from dataclasses import dataclass, field
+from datetime import timedelta
+import asyncio
+from typing import List, Optional, Any, Tuple
 import threading
+import time
+
+from cachetools import TTLCache
 
 from app.config import get_settings
 from app.models.schemas import VehicleStatus, CacheStats
-
-
-@dataclass
-class CacheEntry:
-    """Single cache entry with timestamp and result."""
-    plate_number: str
-    result: VehicleStatus
-    timestamp: datetime = field(default_factory=datetime.now)
-    
-    def is_expired(self, cooldown: timedelta) -> bool:
-        """Check if this entry has expired."""
-        return datetime.now() - self.timestamp > cooldown
+from app.utils.plate_utils import normalize_plate
 
 
 class PlateCache:
     """
     In-memory cache for recently scanned plates.
     Prevents duplicate API calls for plates scanned within the cooldown period.
+    
+    Entries live in TTLCache shards (native expiry on a monotonic clock),
+    each guarded by its own lock so lookups for different plates don't
+    contend on a single global mutex.
     """
     
+    NUM_SHARDS = 16
+    MAX_ENTRIES_PER_SHARD = 10000
+    
     def __init__(self, cooldown_minutes: Optional[int] = None):
         settings = get_settings()
         self._cooldown = timedelta(minutes=cooldown_minutes or settings.cache_cooldown_min)
-        self._cache: Dict[str, CacheEntry] = {}
-        self._lock = threading.Lock()
+        # Expiry runs on integer nanoseconds: no float or datetime math per lookup
+        ttl_ns = int(self._cooldown.total_seconds() * 1_000_000_000)
+        self._shards: List[TTLCache] = [
+            TTLCache(maxsize=self.MAX_ENTRIES_PER_SHARD, ttl=ttl_ns, timer=time.monotonic_ns)
+            for _ in range(self.NUM_SHARDS)
+        ]
+        self._locks = [threading.Lock() for _ in range(self.NUM_SHARDS)]
+        
+        # Statistics (per shard, updated under that shard's lock)
+        self._hit_counts = [0] * self.NUM_SHARDS
+        self._miss_counts = [0] * self.NUM_SHARDS
         
-        # Statistics
-        self._hit_count = 0
-        self._miss_count = 0
+        # Background purge of expired entries, so get_stats can skip it
+        self._cleanup_task: Optional[asyncio.Task] = None
+        self._cleanup_interval_s = self._cooldown.total_seconds() / 4
     
     def _normalize_plate(self, plate_number: str) -> str:
         """Normalize plate number for consistent caching."""
-        return plate_number.upper().replace(" ", "").replace("-", "")
+        return normalize_plate(plate_number)
+    
+    def _shard_index(self, normalized: str) -> int:
+        """Pick the shard that owns a normalized plate."""
+        return hash(normalized) % self.NUM_SHARDS
     
     def is_recently_scanned(self, plate_number: str) -> bool:
         """Check if plate was recently scanned (within cooldown period)."""
         normalized = self._normalize_plate(plate_number)
+        i = self._shard_index(normalized)
         
-        with self._lock:
-            if normalized in self._cache:
-                entry = self._cache[normalized]
-                if not entry.is_expired(self._cooldown):
-                    return True
-                # Entry expired, remove it
-                del self._cache[normalized]
-            return False
+        with self._locks[i]:
+            return normalized in self._shards[i]
     
     def get_cached_result(self, plate_number: str) -> Optional[VehicleStatus]:
         """Get cached result for a plate if available and not expired."""
         normalized = self._normalize_plate(plate_number)
+        i = self._shard_index(normalized)
         
-        with self._lock:
-            if normalized in self._cache:
-                entry = self._cache[normalized]
-                if not entry.is_expired(self._cooldown):
-                    self._hit_count += 1
-                    return entry.result
-                # Entry expired, remove it
-                del self._cache[normalized]
-            self._miss_count += 1
-            return None
+        with self._locks[i]:
+            result = self._shards[i].get(normalized)
+            if result is not None:
+                self._hit_counts[i] += 1
+            else:
+                self._miss_counts[i] += 1
+            return result
     
     def add_plate(self, plate_number: str, result: VehicleStatus) -> None:
         """Add a plate and its result to the cache."""
         normalized = self._normalize_plate(plate_number)
+        i = self._shard_index(normalized)
         
-        with self._lock:
-            self._cache[normalized] = CacheEntry(
-                plate_number=normalized,
-                result=result,
-                timestamp=datetime.now()
-            )
+        with self._locks[i]:
+            self._shards[i][normalized] = result
     
     def get_or_fetch(
         self, 
@@ -122,45 +124,69 @@ class PlateCache:
         """Remove all expired entries. Returns count of removed entries."""
         removed = 0
         
-        with self._lock:
-            expired_keys = [
-                key for key, entry in self._cache.items()
-                if entry.is_expired(self._cooldown)
-            ]
-            for key in expired_keys:
-                del self._cache[key]
-                removed += 1
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                removed += len(shard.expire())
         
         return removed
     
+    async def start_cleanup(self) -> None:
+        """Start the background task that purges expired entries every cooldown/4."""
+        if self._cleanup_task is None:
+            self._cleanup_task = asyncio.create_task(self._run_cleanup())
+    
+    async def stop_cleanup(self) -> None:
+        """Stop the background cleanup task."""
+        if self._cleanup_task is None:
+            return
+        self._cleanup_task.cancel()
+        try:
+            await self._cleanup_task
+        except asyncio.CancelledError:
+            pass
+        self._cleanup_task = None
+    
+    async def _run_cleanup(self) -> None:
+        """Periodically purge expired entries."""
+        while True:
+            await asyncio.sleep(self._cleanup_interval_s)
+            self.cleanup_expired()
+    
     def clear(self) -> None:
         """Clear all cache entries."""
-        with self._lock:
-            self._cache.clear()
-            self._hit_count = 0
-            self._miss_count = 0
+        for i, (shard, lock) in enumerate(zip(self._shards, self._locks)):
+            with lock:
+                shard.clear()
+                self._hit_counts[i] = 0
+                self._miss_counts[i] = 0
     
     def get_stats(self) -> CacheStats:
-        """Get cache statistics."""
-        with self._lock:
-            total = len(self._cache)
-            expired = sum(
-                1 for entry in self._cache.values()
-                if entry.is_expired(self._cooldown)
-            )
-            active = total - expired
-            
-            total_requests = self._hit_count + self._miss_count
-            hit_rate = self._hit_count / total_requests if total_requests > 0 else 0.0
-            
-            return CacheStats(
-                total_entries=total,
-                active_entries=active,
-                expired_entries=expired,
-                hit_count=self._hit_count,
-                miss_count=self._miss_count,
-                hit_rate=hit_rate
-            )
+        """
+        Get cache statistics.
+        Only reads counters: expired entries are purged by the cleanup task
+        (or lazily on lookup), so they are not counted separately here.
+        """
+        entries = 0
+        hits = 0
+        misses = 0
+        
+        for i, (shard, lock) in enumerate(zip(self._shards, self._locks)):
+            with lock:
+                entries += len(shard)
+                hits += self._hit_counts[i]
+                misses += self._miss_counts[i]
+        
+        total_requests = hits + misses
+        hit_rate = hits / total_requests if total_requests > 0 else 0.0
+        
+        return CacheStats(
+            total_entries=entries,
+            active_entries=entries,
+            expired_entries=0,
+            hit_count=hits,
+            miss_count=misses,
+            hit_rate=hit_rate
+        )
 
 
 # Global cache instance
@@ -1,13 +1,19 @@
 import httpx
+import orjson
 from typing import Optional
 from datetime import datetime, timedelta
 import random
+from functools import lru_cache
+from pydantic import TypeAdapter
 
 from app.config import get_settings
 from app.models.schemas import VehicleStatus
 
 settings = get_settings()
 
+# Built once; constructing a TypeAdapter per call is expensive
+_VEHICLE_ADAPTER = TypeAdapter(VehicleStatus)
+
 
 class ValidationAPIClient:
     """
@@ -19,13 +25,21 @@ class ValidationAPIClient:
         self._base_url = settings.external_api_url
         self._timeout = settings.external_api_timeout
         self._client: Optional[httpx.AsyncClient] = None
+        # Keep connections alive across scans to skip TCP/TLS handshakes
+        self._limits = httpx.Limits(max_keepalive_connections=100, max_connections=200)
+    
+    async def start(self) -> None:
+        """Create the shared HTTP client up front (called on app startup)."""
+        await self._get_client()
     
     async def _get_client(self) -> httpx.AsyncClient:
         """Get or create HTTP client."""
         if self._client is None or self._client.is_closed:
             self._client = httpx.AsyncClient(
                 base_url=self._base_url,
-                timeout=self._timeout
+                timeout=self._timeout,
+                http2=True,
+                limits=self._limits
             )
         return self._client
     
@@ -44,16 +58,9 @@ class ValidationAPIClient:
             response = await client.get(f"/vehicle/{plate_number}")
             
             if response.status_code == 200:
-                data = response.json()
-                return VehicleStatus(
-                    plate_number=plate_number,
-                    owner_name=data.get("owner_name"),
-                    owner_id=data.get("owner_id"),
-                    road_tax_valid=data.get("road_tax_valid", True),
-                    road_tax_expiry=data.get("road_tax_expiry"),
-                    insurance_valid=data.get("insurance_valid", True),
-                    insurance_expiry=data.get("insurance_expiry")
-                )
+                data = orjson.loads(response.content)
+                data["plate_number"] = plate_number
+                return _VEHICLE_ADAPTER.validate_python(data)
             elif response.status_code == 404:
                 # Vehicle not found in system - assume compliant (new vehicle)
                 return VehicleStatus(
@@ -105,45 +112,9 @@ class ValidationAPIClient:
         Generate mock vehicle status for demo/testing.
         Uses deterministic randomization based on plate number.
         """
-        # Use plate number hash for deterministic results
-        seed = sum(ord(c) for c in plate_number)
-        random.seed(seed)
-        
-        # 60% chance of being compliant
-        is_tax_valid = random.random() < 0.6
-        is_insurance_valid = random.random() < 0.7
-        
-        # Generate mock owner info
-        mock_names = [
-            "Ahmad bin Abdullah", "Tan Wei Ming", "Siti Nurhaliza",
-            "Raj Kumar", "Lee Chong Wei", "Maria Gonzales",
-            "Wong Kar Wai", "Fatimah binti Hassan", "Chen Xiaoming"
-        ]
-        
-        mock_name = mock_names[seed % len(mock_names)]
-        mock_id = f"{''.join(str((seed * 7 + i) % 10) for i in range(12))}"
-        
-        # Generate expiry dates
-        now = datetime.now()
-        if is_tax_valid:
-            tax_expiry = now + timedelta(days=random.randint(30, 365))
-        else:
-            tax_expiry = now - timedelta(days=random.randint(1, 180))
-        
-        if is_insurance_valid:
-            insurance_expiry = now + timedelta(days=random.randint(30, 365))
-        else:
-            insurance_expiry = now - timedelta(days=random.randint(1, 180))
-        
-        return VehicleStatus(
-            plate_number=plate_number,
-            owner_name=mock_name,
-            owner_id=mock_id,
-            road_tax_valid=is_tax_valid,
-            road_tax_expiry=tax_expiry,
-            insurance_valid=is_insurance_valid,
-            insurance_expiry=insurance_expiry
-        )
+        # Expiry dates are relative to now; bucket by hour so results stay cacheable
+        now = datetime.now().replace(minute=0, second=0, microsecond=0)
+        return _mock_status_for(plate_number, now)
     
     async def close(self):
         """Close the HTTP client."""
@@ -151,6 +122,53 @@ class ValidationAPIClient:
             await self._client.aclose()
 
 
+@lru_cache(maxsize=10000)
+def _mock_status_for(plate_number: str, now: datetime) -> VehicleStatus:
+    """
+    Generate mock vehicle status for demo/testing.
+    Uses deterministic randomization based on plate number, with a local
+    RNG so concurrent calls don't share (or disturb) global random state.
+    """
+    # Use plate number hash for deterministic results
+    seed = sum(ord(c) for c in plate_number)
+    rng = random.Random(seed)
+    
+    # 60% chance of being compliant
+    is_tax_valid = rng.random() < 0.6
+    is_insurance_valid = rng.random() < 0.7
+    
+    # Generate mock owner info
+    mock_names = [
+        "Ahmad bin Abdullah", "Tan Wei Ming", "Siti Nurhaliza",
+        "Raj Kumar", "Lee Chong Wei", "Maria Gonzales",
+        "Wong Kar Wai", "Fatimah binti Hassan", "Chen Xiaoming"
+    ]
+    
+    mock_name = mock_names[seed % len(mock_names)]
+    mock_id = f"{''.join(str((seed * 7 + i) % 10) for i in range(12))}"
+    
+    # Generate expiry dates
+    if is_tax_valid:
+        tax_expiry = now + timedelta(days=rng.randint(30, 365))
+    else:
+        tax_expiry = now - timedelta(days=rng.randint(1, 180))
+    
+    if is_insurance_valid:
+        insurance_expiry = now + timedelta(days=rng.randint(30, 365))
+    else:
+        insurance_expiry = now - timedelta(days=rng.randint(1, 180))
+    
+    return VehicleStatus(
+        plate_number=plate_number,
+        owner_name=mock_name,
+        owner_id=mock_id,
+        road_tax_valid=is_tax_valid,
+        road_tax_expiry=tax_expiry,
+        insurance_valid=is_insurance_valid,
+        insurance_expiry=insurance_expiry
+    )
+
+
 # Global validation API client instance
 validation_api = ValidationAPIClient()
 
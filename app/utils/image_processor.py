@@ -1,6 +1,86 @@
 import cv2
 import numpy as np
-from typing import Tuple, Optional
+import threading
+from typing import Tuple, Optional, Union
+
+# SIMD-accelerated base64 codec when available
+try:
+    from pybase64 import b64decode as _b64decode, b64encode as _b64encode
+except ImportError:
+    from base64 import b64decode as _b64decode, b64encode as _b64encode
+
+# Direct libjpeg-turbo bindings when PyTurboJPEG and the shared library are installed
+try:
+    from turbojpeg import TurboJPEG
+    _tj = TurboJPEG()
+except (ImportError, OSError, RuntimeError):
+    _tj = None
+
+# Per-thread destination buffers for decode_jpeg(reuse_buffer=True)
+_decode_local = threading.local()
+
+# Per-thread destination buffers for encode_jpeg(reuse_buffer=True)
+_encode_local = threading.local()
+
+# Cleared if the installed PyTurboJPEG predates dst= support (added in 1.8.2)
+_tj_dst_supported = True
+
+# CLAHE objects hold internal buffers and are not thread-safe: one per thread
+_clahe_local = threading.local()
+
+
+def _get_clahe():
+    """Get this thread's cached CLAHE instance."""
+    clahe = getattr(_clahe_local, 'clahe', None)
+    if clahe is None:
+        clahe = _clahe_local.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    return clahe
+
+
+# GPU CLAHE via cuCIM when a CUDA device is present
+try:
+    import cupy as _cp
+    from cucim.skimage.exposure import equalize_adapthist as _gpu_equalize_adapthist
+    _HAS_GPU_CLAHE = _cp.cuda.runtime.getDeviceCount() > 0
+except Exception:
+    _HAS_GPU_CLAHE = False
+
+# Below this size the PCIe round trip costs more than CPU CLAHE
+_GPU_CLAHE_MIN_PIXELS = 1280 * 720
+
+
+def _apply_clahe(channel: np.ndarray) -> np.ndarray:
+    """
+    Apply CLAHE (clip 2.0, 8x8 tiles) to a single uint8 channel,
+    on the GPU for large frames when cuCIM is available.
+    """
+    if _HAS_GPU_CLAHE and channel.size >= _GPU_CLAHE_MIN_PIXELS:
+        height, width = channel.shape[:2]
+        # OpenCV's clipLimit is relative to the uniform bin height (1/256)
+        equalized = _gpu_equalize_adapthist(
+            _cp.asarray(channel),
+            kernel_size=(max(1, height // 8), max(1, width // 8)),
+            clip_limit=2.0 / 256
+        )
+        return _cp.asnumpy((equalized * 255).astype(_cp.uint8))
+    return _get_clahe().apply(channel)
+
+
+def decode_base64_image(data: str) -> bytes:
+    """
+    Decode a base64 image string, with or without a data URL prefix.
+    """
+    if ',' in data:
+        data = data.split(',', 1)[1]
+    return _b64decode(data)
+
+
+def encode_base64_image(buffer) -> str:
+    """
+    Base64-encode an encoded image buffer (bytes, a memoryview or the
+    ndarray from cv2.imencode), using pybase64's SIMD codec when installed.
+    """
+    return _b64encode(buffer).decode('ascii')
 
 
 def resize_image(
@@ -21,10 +101,173 @@ def resize_image(
     scale_h = max_height / height
     scale = min(scale_w, scale_h)
     
+    # Near-identity downscale: not worth a full resampling pass
+    if scale >= 0.98:
+        return image
+    
     new_width = int(width * scale)
     new_height = int(height * scale)
     
-    return cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
+    # INTER_AREA only pays off for strong downscaling; bilinear is faster above 0.5x
+    interpolation = cv2.INTER_AREA if scale < 0.5 else cv2.INTER_LINEAR_EXACT
+    return cv2.resize(image, (new_width, new_height), interpolation=interpolation)
+
+
+def get_jpeg_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """
+    Read (width, height) from a JPEG header without decoding pixels.
+    Returns None if the data is not a parseable JPEG.
+    """
+    if data[:2] != b'\xff\xd8':
+        return None
+    
+    i = 2
+    n = len(data)
+    while i + 9 < n:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        
+        # Fill bytes and standalone markers carry no length
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+        
+        # SOFn frame header holds the image dimensions (C4/C8/CC are not SOF)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = int.from_bytes(data[i + 5:i + 7], 'big')
+            width = int.from_bytes(data[i + 7:i + 9], 'big')
+            return width, height
+        
+        i += 2 + int.from_bytes(data[i + 2:i + 4], 'big')
+    
+    return None
+
+
+def decode_image(
+    image_bytes: bytes,
+    max_width: int,
+    max_height: int,
+    fast: bool = False
+) -> Optional[np.ndarray]:
+    """
+    Decode JPEG/PNG bytes for processing at up to max_width x max_height.
+    Large JPEGs are decoded at 1/2 or 1/4 scale by libjpeg's IDCT, which is
+    cheaper than a full decode followed by cv2.resize. The reduction never
+    drops below the target size unless fast is set, which always halves.
+    """
+    flags = cv2.IMREAD_REDUCED_COLOR_2 if fast else cv2.IMREAD_COLOR
+    size = get_jpeg_size(image_bytes)
+    if size is not None and size[0] > 0 and size[1] > 0:
+        scale = min(max_width / size[0], max_height / size[1])
+        if scale <= 0.25:
+            flags = cv2.IMREAD_REDUCED_COLOR_4
+        elif scale <= 0.5:
+            flags = cv2.IMREAD_REDUCED_COLOR_2
+    
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    return cv2.imdecode(nparr, flags)
+
+
+def decode_and_resize(image_bytes: bytes, max_width: int, max_height: int) -> Optional[np.ndarray]:
+    """
+    Decode image bytes and shrink to fit within max_width x max_height.
+    """
+    image = decode_image(image_bytes, max_width, max_height)
+    
+    if image is None:
+        return None
+    
+    height, width = image.shape[:2]
+    if width > max_width or height > max_height:
+        scale = min(max_width / width, max_height / height)
+        image = cv2.resize(image, (int(width * scale), int(height * scale)))
+    return image
+
+
+def decode_jpeg(image_bytes: bytes, reuse_buffer: bool = False) -> Optional[np.ndarray]:
+    """
+    Decode image bytes to a full-size BGR image.
+    JPEGs go straight through libjpeg-turbo when available. With
+    reuse_buffer, the JPEG is decoded into a per-thread buffer kept for its
+    size, so the result is only valid until this thread's next such call.
+    """
+    if _tj is not None and image_bytes[:2] == b'\xff\xd8':
+        if reuse_buffer and _tj_dst_supported:
+            size = get_jpeg_size(image_bytes)
+            if size is not None:
+                try:
+                    return _tj.decode(image_bytes, dst=_get_decode_buffer(*size))
+                except TypeError as e:
+                    _disable_tj_dst(e)
+        try:
+            return _tj.decode(image_bytes)
+        except OSError:
+            pass  # libjpeg-turbo rejected the data; let OpenCV have a go
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+def _disable_tj_dst(error: Exception) -> None:
+    """Stop passing dst= to an old PyTurboJPEG, logging it once."""
+    global _tj_dst_supported
+    if _tj_dst_supported:
+        _tj_dst_supported = False
+        print(f"⚠️ PyTurboJPEG has no dst= support ({error}); upgrade to >=1.8.2 for buffer reuse")
+
+
+def _get_decode_buffer(width: int, height: int) -> np.ndarray:
+    """Get this thread's BGR decode buffer for a frame size."""
+    buffers = getattr(_decode_local, 'buffers', None)
+    if buffers is None:
+        buffers = _decode_local.buffers = {}
+    buf = buffers.get((width, height))
+    if buf is None:
+        # Camera streams use one or two sizes; don't let odd uploads pile up
+        if len(buffers) >= 4:
+            buffers.clear()
+        buf = buffers[(width, height)] = np.empty((height, width, 3), dtype=np.uint8)
+    return buf
+
+
+def _get_encode_buffer(image: np.ndarray) -> bytearray:
+    """Get this thread's JPEG output buffer, grown to the worst case for image."""
+    needed = _tj.buffer_size(image)
+    buf = getattr(_encode_local, 'buffer', None)
+    if buf is None or len(buf) < needed:
+        buf = _encode_local.buffer = bytearray(needed)
+    return buf
+
+
+def encode_jpeg(
+    image: np.ndarray,
+    quality: int = 75,
+    optimize: bool = True,
+    reuse_buffer: bool = False
+) -> Union[bytes, memoryview, np.ndarray]:
+    """
+    Encode a BGR image as JPEG.
+    With libjpeg-turbo bindings available the encode skips OpenCV entirely;
+    otherwise optimize enables optimized Huffman tables for a smaller payload.
+    With reuse_buffer, libjpeg-turbo writes into a per-thread buffer and a
+    memoryview of the JPEG is returned, valid until this thread's next such call.
+    """
+    if _tj is not None:
+        if reuse_buffer and _tj_dst_supported:
+            try:
+                buf, size = _tj.encode(image, quality=quality, dst=_get_encode_buffer(image))
+                return memoryview(buf)[:size]
+            except TypeError as e:
+                _disable_tj_dst(e)
+        return _tj.encode(image, quality=quality)
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+    if optimize:
+        params += [cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+    _, buffer = cv2.imencode('.jpg', image, params)
+    return buffer
 
 
 def enhance_contrast(image: np.ndarray) -> np.ndarray:
@@ -34,19 +277,15 @@ def enhance_contrast(image: np.ndarray) -> np.ndarray:
     if len(image.shape) == 3:
         # Convert to LAB color space
         lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
         
-        # Apply CLAHE to L channel
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        l = clahe.apply(l)
+        # Apply CLAHE to L channel, writing it back in place (no split/merge copies)
+        lab[:, :, 0] = _apply_clahe(lab[:, :, 0])
         
-        # Merge and convert back
-        lab = cv2.merge([l, a, b])
+        # Convert back
         return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
     else:
         # Grayscale image
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        return clahe.apply(image)
+        return _apply_clahe(image)
 
 
 def detect_plate_region(image: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
@@ -57,17 +296,38 @@ def detect_plate_region(image: np.ndarray) -> Optional[Tuple[int, int, int, int]
     # Convert to grayscale
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
     
-    # Blur and edge detection
-    blur = cv2.bilateralFilter(gray, 11, 17, 17)
+    # Localize on a copy no larger than 640px on its long edge; plates stay
+    # detectable there and every pixel op below gets proportionally cheaper
+    height, width = gray.shape[:2]
+    scale = max(1.0, max(height, width) / 640.0)
+    if scale > 1.0:
+        gray = cv2.resize(gray, (int(width / scale), int(height / scale)), interpolation=cv2.INTER_AREA)
+    min_w = 60 / scale
+    min_h = 20 / scale
+    
+    # Blur and edge detection (separable Gaussian; Canny tolerates the
+    # softer edges and it is far cheaper than a d=11 bilateral filter)
+    blur = cv2.GaussianBlur(gray, (5, 5), 0)
     edges = cv2.Canny(blur, 30, 200)
     
     # Find contours
     contours, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
     
-    # Sort by area, largest first
-    contours = sorted(contours, key=cv2.contourArea, reverse=True)[:30]
+    # Keep the 30 largest by area, largest first (partial select, then sort only those)
+    if len(contours) > 30:
+        areas = np.fromiter((cv2.contourArea(c) for c in contours), dtype=np.float32, count=len(contours))
+        top = np.argpartition(-areas, 30)[:30]
+        top = top[np.argsort(-areas[top], kind='stable')]
+        contours = [contours[i] for i in top]
+    else:
+        contours = sorted(contours, key=cv2.contourArea, reverse=True)
     
     for contour in contours:
+        # Cheap bounding-box pre-check before approximating the polygon
+        _, _, bw, bh = cv2.boundingRect(contour)
+        if bw < min_w or bh < min_h or not (2.0 <= bw / max(bh, 1) <= 5.0):
+            continue
+        
         # Approximate contour
         peri = cv2.arcLength(contour, True)
         approx = cv2.approxPolyDP(contour, 0.018 * peri, True)
@@ -80,8 +340,9 @@ def detect_plate_region(image: np.ndarray) -> Optional[Tuple[int, int, int, int]
             aspect_ratio = w / h
             if 2.0 <= aspect_ratio <= 5.0:
                 # Check minimum size
-                if w >= 60 and h >= 20:
-                    return (x, y, w, h)
+                if w >= min_w and h >= min_h:
+                    # Map back to full-resolution coordinates
+                    return (int(x * scale), int(y * scale), int(w * scale), int(h * scale))
     
     return None
 
@@ -112,15 +373,32 @@ def deskew_image(image: np.ndarray) -> np.ndarray:
     """
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
     
+    # The angle survives uniform downscaling, so estimate it on a 1/4-size
+    # copy (when that is still big enough) and rotate at full resolution
+    small = gray
+    if min(gray.shape[:2]) >= 200:
+        small = cv2.resize(gray, None, fx=0.25, fy=0.25, interpolation=cv2.INTER_AREA)
+    min_points = 100 * small.size / gray.size
+    
     # Threshold
-    _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    _, thresh = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
     
-    # Find coordinates of non-zero pixels
-    coords = np.column_stack(np.where(thresh > 0))
+    # Find coordinates of non-zero pixels (int32, no boolean mask or int64 stack)
+    points = cv2.findNonZero(thresh)
     
-    if len(coords) < 100:
+    if points is None or len(points) < min_points:
         return image
     
+    points = points.reshape(-1, 2)
+    
+    # The orientation estimate is stable on a sample; seeded so results are repeatable
+    if len(points) > 10000:
+        idx = np.random.default_rng(0).choice(len(points), 10000, replace=False)
+        points = points[idx]
+    
+    # findNonZero yields (x, y); keep the (row, col) order the angle logic below expects
+    coords = np.ascontiguousarray(points[:, ::-1])
+    
     # Get rotation angle
     angle = cv2.minAreaRect(coords)[-1]
     
@@ -137,10 +415,12 @@ def deskew_image(image: np.ndarray) -> np.ndarray:
     (h, w) = image.shape[:2]
     center = (w // 2, h // 2)
     M = cv2.getRotationMatrix2D(center, angle, 1.0)
+    # Bilinear is indistinguishable from bicubic at these small angles
     rotated = cv2.warpAffine(
         image, M, (w, h),
-        flags=cv2.INTER_CUBIC,
-        borderMode=cv2.BORDER_REPLICATE
+        flags=cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_CONSTANT,
+        borderValue=0
     )
     
     return rotated
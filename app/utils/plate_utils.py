@@ -0,0 +1,9 @@
+# Characters dropped when normalizing plate numbers
+_PLATE_TRANS = str.maketrans("", "", " -")
+
+
+def normalize_plate(plate_number: str) -> str:
+    """
+    Normalize a plate number to its canonical form (uppercase, no spaces or dashes).
+    """
+    return plate_number.translate(_PLATE_TRANS).upper()
@@ -4,19 +4,24 @@ Run on port 8001 to view YOLOv8 detections in a large window
 """
 
 import cv2
-import base64
 import asyncio
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import threading
+import time
+from typing import Optional
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-import numpy as np
 
 # Import the plate detector from main app
 import sys
 import os
 sys.path.insert(0, os.path.dirname(__file__))
 from app.services.plate_detector import plate_detector
+from app.utils.image_processor import decode_base64_image, decode_jpeg, encode_base64_image, encode_jpeg
+
+# One OpenCV thread per call: concurrent frames are the unit of parallelism
+cv2.setNumThreads(1)
 
 app = FastAPI(title="YOLOv8 Detection Viewer")
 
@@ -325,6 +330,21 @@ HTML_PAGE = """
                 this.isRunning = false;
                 this.stream = null;
                 this.ws = null;
+                this.pendingImage = null;
+                this.pendingReplies = [];
+                
+                // Frames sent but not yet answered; camera frames that arrive
+                // while the window is full are skipped instead of queued
+                this.inFlight = 0;
+                this.maxInFlight = 2;
+                this.frameSeq = 0;
+                this.paintedSeq = 0;
+                
+                // Reused capture canvas (smaller than the camera for faster processing)
+                this.offscreen = document.createElement('canvas');
+                this.offscreen.width = 640;
+                this.offscreen.height = 480;
+                this.offCtx = this.offscreen.getContext('2d');
                 this.frameCount = 0;
                 this.lastFpsTime = Date.now();
                 this.totalPlates = 0;
@@ -361,13 +381,21 @@ HTML_PAGE = """
                     this.canvas.width = this.video.videoWidth;
                     this.canvas.height = this.video.videoHeight;
                     
+                    try {
+                        this.ws = await this.connectSocket();
+                    } catch (error) {
+                        // Fall back to posting raw JPEG frames over HTTP
+                        console.warn('WebSocket unavailable, using /detect_raw:', error);
+                        this.ws = null;
+                    }
+                    
                     this.isRunning = true;
                     this.startBtn.disabled = true;
                     this.stopBtn.disabled = false;
                     this.statusDot.classList.add('active');
                     this.statusText.textContent = 'Running';
                     
-                    this.processFrames();
+                    this.scheduleFrame();
                 } catch (error) {
                     console.error('Camera error:', error);
                     this.statusText.textContent = 'Camera error: ' + error.message;
@@ -377,6 +405,11 @@ HTML_PAGE = """
             stop() {
                 this.isRunning = false;
                 
+                if (this.ws) {
+                    this.ws.close();
+                    this.ws = null;
+                }
+                
                 if (this.stream) {
                     this.stream.getTracks().forEach(track => track.stop());
                     this.stream = null;
@@ -389,79 +422,133 @@ HTML_PAGE = """
                 this.statusText.textContent = 'Stopped';
             }
             
-            async processFrames() {
-                if (!this.isRunning) return;
-                
-                const startTime = performance.now();
-                
-                // Use smaller canvas for faster processing (640x480)
-                const targetWidth = 640;
-                const targetHeight = 480;
+            connectSocket() {
+                // Frames go up as binary JPEG; each reply is the annotated JPEG
+                // (binary) followed by a JSON message with the detection info
+                return new Promise((resolve, reject) => {
+                    const protocol = location.protocol === 'https:' ? 'wss' : 'ws';
+                    const ws = new WebSocket(`${protocol}://${location.host}/ws/detect`);
+                    ws.binaryType = 'blob';
+                    ws.onopen = () => resolve(ws);
+                    ws.onerror = (error) => reject(error);
+                    ws.onmessage = (event) => this.onSocketMessage(event);
+                    ws.onclose = () => {
+                        // Release anyone still waiting on a reply
+                        for (const resolveReply of this.pendingReplies) resolveReply(null);
+                        this.pendingReplies = [];
+                        if (this.ws === ws) this.stop();
+                    };
+                });
+            }
+            
+            onSocketMessage(event) {
+                if (typeof event.data !== 'string') {
+                    this.pendingImage = event.data;
+                    return;
+                }
                 
-                const offscreen = document.createElement('canvas');
-                offscreen.width = targetWidth;
-                offscreen.height = targetHeight;
-                const offCtx = offscreen.getContext('2d');
-                offCtx.drawImage(this.video, 0, 0, targetWidth, targetHeight);
+                const reply = { image: this.pendingImage, result: JSON.parse(event.data) };
+                this.pendingImage = null;
                 
-                // Lower quality for faster transfer
-                const imageData = offscreen.toDataURL('image/jpeg', 0.7);
+                const resolveReply = this.pendingReplies.shift();
+                if (resolveReply) resolveReply(reply);
+            }
+            
+            sendFrame(blob) {
+                if (!this.ws) return this.postFrame(blob);
+                return new Promise(resolve => {
+                    this.pendingReplies.push(resolve);
+                    this.ws.send(blob);
+                });
+            }
+            
+            async postFrame(blob) {
+                const response = await fetch('/detect_raw', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'image/jpeg' },
+                    body: blob
+                });
+                const result = await response.json();
+                const image = result.image ? await (await fetch(result.image)).blob() : null;
+                return { image, result };
+            }
+            
+            scheduleFrame() {
+                if (!this.isRunning) return;
+                // Fire once per decoded camera frame where supported
+                if ('requestVideoFrameCallback' in HTMLVideoElement.prototype) {
+                    this.video.requestVideoFrameCallback(() => this.onVideoFrame());
+                } else {
+                    requestAnimationFrame(() => this.onVideoFrame());
+                }
+            }
+            
+            onVideoFrame() {
+                if (!this.isRunning) return;
+                if (this.inFlight < this.maxInFlight) {
+                    this.processFrame();
+                }
+                this.scheduleFrame();
+            }
+            
+            async processFrame() {
+                this.inFlight++;
+                const seq = ++this.frameSeq;
                 
                 try {
-                    const response = await fetch('/detect', {
-                        method: 'POST',
-                        headers: { 'Content-Type': 'application/json' },
-                        body: JSON.stringify({ image: imageData })
-                    });
+                    // toBlob snapshots the canvas, so the next frame can reuse it right away
+                    this.offCtx.drawImage(this.video, 0, 0, this.offscreen.width, this.offscreen.height);
                     
-                    const result = await response.json();
+                    // Lower quality for faster transfer
+                    const blob = await new Promise(resolve => this.offscreen.toBlob(resolve, 'image/jpeg', 0.7));
+                    if (!this.isRunning) return;
                     
-                    // Draw detection result
-                    if (result.image) {
-                        const img = new Image();
-                        img.onload = () => {
-                            this.ctx.drawImage(img, 0, 0, this.canvas.width, this.canvas.height);
-                        };
-                        img.src = result.image;
-                    }
-                    
-                    // Update stats
-                    this.frameCount++;
-                    const now = Date.now();
-                    if (now - this.lastFpsTime >= 1000) {
-                        document.getElementById('fps').textContent = this.frameCount;
-                        this.frameCount = 0;
-                        this.lastFpsTime = now;
+                    const reply = await this.sendFrame(blob);
+                    if (reply) await this.showResult(reply.image, reply.result, seq);
+                } catch (error) {
+                    console.error('Detection error:', error);
+                } finally {
+                    this.inFlight--;
+                }
+            }
+            
+            async showResult(image, result, seq) {
+                // Draw detection result (never over a newer frame's result)
+                if (image && image.size > 0) {
+                    const bitmap = await createImageBitmap(image);
+                    if (seq > this.paintedSeq) {
+                        this.paintedSeq = seq;
+                        this.ctx.drawImage(bitmap, 0, 0, this.canvas.width, this.canvas.height);
                     }
+                    bitmap.close();
+                }
+                
+                // Update stats
+                this.frameCount++;
+                const now = Date.now();
+                if (now - this.lastFpsTime >= 1000) {
+                    document.getElementById('fps').textContent = this.frameCount;
+                    this.frameCount = 0;
+                    this.lastFpsTime = now;
+                }
+                
+                document.getElementById('detections').textContent = result.detections || 0;
+                
+                // Log detections
+                if (result.plates && result.plates.length > 0) {
+                    this.totalPlates += result.plates.length;
+                    document.getElementById('totalPlates').textContent = this.totalPlates;
                     
-                    document.getElementById('detections').textContent = result.detections || 0;
-                    
-                    // Log detections
-                    if (result.plates && result.plates.length > 0) {
-                        this.totalPlates += result.plates.length;
-                        document.getElementById('totalPlates').textContent = this.totalPlates;
-                        
-                        for (const plate of result.plates) {
-                            this.confidences.push(plate.confidence);
-                            if (this.confidences.length > 100) this.confidences.shift();
-                            
-                            this.addLogEntry(plate);
-                        }
+                    for (const plate of result.plates) {
+                        this.confidences.push(plate.confidence);
+                        if (this.confidences.length > 100) this.confidences.shift();
                         
-                        const avgConf = this.confidences.reduce((a, b) => a + b, 0) / this.confidences.length;
-                        document.getElementById('avgConf').textContent = (avgConf * 100).toFixed(0) + '%';
+                        this.addLogEntry(plate);
                     }
                     
-                } catch (error) {
-                    console.error('Detection error:', error);
+                    const avgConf = this.confidences.reduce((a, b) => a + b, 0) / this.confidences.length;
+                    document.getElementById('avgConf').textContent = (avgConf * 100).toFixed(0) + '%';
                 }
-                
-                // Calculate delay to achieve target FPS (15 FPS = ~66ms per frame)
-                const elapsed = performance.now() - startTime;
-                const targetDelay = Math.max(1, 66 - elapsed); // Target 15 FPS
-                
-                // Use requestAnimationFrame for smoother rendering
-                setTimeout(() => requestAnimationFrame(() => this.processFrames()), targetDelay);
             }
             
             addLogEntry(plate) {
@@ -505,42 +592,242 @@ async def device_info():
     }
 
 
+class FrameSkipGate:
+    """
+    Adaptive frame skipping for quiet scenes, one per WebSocket connection.
+    Once nearly all recent frames came back empty and inference is slower
+    than the latency budget, every other frame reuses the last annotated
+    JPEG instead of running YOLOv8.
+    """
+    
+    def __init__(self, latency_budget_s: float = 0.05):
+        self._lock = threading.Lock()
+        self._latency_budget_s = latency_budget_s
+        self._ema_empty = 0.0
+        self._ema_latency_s = 0.0
+        self._skip_counter = 0
+        self._last_jpeg = None
+    
+    def cached(self):
+        """Return the last annotated JPEG if this frame should be skipped, else None."""
+        with self._lock:
+            self._skip_counter += 1
+            if (
+                self._last_jpeg is not None
+                and self._ema_empty > 0.9
+                and self._ema_latency_s > self._latency_budget_s
+                and self._skip_counter % 2 == 0
+            ):
+                return self._last_jpeg
+            return None
+    
+    def record(self, num_detections: int, latency_s: float) -> None:
+        """Update the moving averages after an inference."""
+        with self._lock:
+            self._ema_empty = 0.9 * self._ema_empty + 0.1 * (num_detections == 0)
+            self._ema_latency_s = 0.9 * self._ema_latency_s + 0.1 * latency_s
+    
+    def remember(self, jpeg) -> None:
+        """Keep the latest annotated JPEG for skipped frames."""
+        with self._lock:
+            self._last_jpeg = jpeg
+
+
+def _annotate_frame(image_bytes: bytes, gate: Optional[FrameSkipGate] = None):
+    """
+    Run YOLOv8 on an encoded frame, recording its latency in gate if given.
+    Returns (annotated image or None, number of detections, plate info list).
+    """
+    # Decoded into a per-thread buffer: the frame is finished with before this
+    # thread decodes the next one (the annotated output is a separate copy)
+    image = decode_jpeg(image_bytes, reuse_buffer=True)
+    
+    if image is None:
+        return None, 0, []
+    
+    # Single inference: Get visualization and extract plate info from results
+    start = time.perf_counter()
+    annotated, num_detections, plates = plate_detector.get_yolo_visualization_with_info(image)
+    if gate is not None:
+        gate.record(num_detections, time.perf_counter() - start)
+    return annotated, num_detections, plates
+
+
+def _encode_frame(annotated, gate: Optional[FrameSkipGate] = None, reuse_buffer: bool = False):
+    """
+    Encode result image with lower quality for faster transfer.
+    With reuse_buffer the JPEG lives in this thread's encode buffer and must be
+    consumed on this thread before its next encode, so it is never given a gate.
+    """
+    buffer = encode_jpeg(annotated, quality=65, optimize=False, reuse_buffer=reuse_buffer)
+    if gate is not None:
+        gate.remember(buffer)
+    return buffer
+
+
+def _detect_frame(image_bytes: bytes):
+    """
+    Run YOLOv8 on an encoded frame.
+    Returns (annotated JPEG or None, number of detections, plate info list);
+    the JPEG is in this thread's encode buffer and must be used before the
+    thread encodes again.
+    """
+    annotated, num_detections, plates = _annotate_frame(image_bytes)
+    
+    if annotated is None:
+        return None, 0, []
+    
+    return _encode_frame(annotated, reuse_buffer=True), num_detections, plates
+
+
+def _process(image_data: str) -> dict:
+    """Decode a base64 frame, run YOLOv8 and encode the annotated result."""
+    return _process_bytes(decode_base64_image(image_data))
+
+
+def _process_bytes(image_bytes: bytes) -> dict:
+    """Run YOLOv8 on an encoded frame and build the /detect JSON response."""
+    buffer, num_detections, plates = _detect_frame(image_bytes)
+    
+    if buffer is None:
+        return {"image": None, "detections": 0, "plates": []}
+    
+    result_base64 = encode_base64_image(buffer)
+    
+    return {
+        "image": f"data:image/jpeg;base64,{result_base64}",
+        "detections": num_detections,
+        "plates": plates
+    }
+
+
 @app.post("/detect")
 async def detect(request: dict):
     """
     Process a frame and return YOLOv8 detection visualization.
-    Optimized for high FPS (~15+ FPS).
+    Optimized for high FPS (~15+ FPS): decode, inference and encode run
+    in a worker thread so frames from several clients overlap.
     """
     try:
-        image_data = request.get("image", "")
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]
-        
-        image_bytes = base64.b64decode(image_data)
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            return {"image": None, "detections": 0, "plates": []}
-        
-        # Single inference: Get visualization and extract plate info from results
-        annotated, num_detections, plates = plate_detector.get_yolo_visualization_with_info(image)
-        
-        # Encode result image with lower quality for faster transfer
-        _, buffer = cv2.imencode('.jpg', annotated, [cv2.IMWRITE_JPEG_QUALITY, 65])
-        result_base64 = base64.b64encode(buffer).decode('utf-8')
+        return await asyncio.to_thread(_process, request.get("image", ""))
         
-        return {
-            "image": f"data:image/jpeg;base64,{result_base64}",
-            "detections": num_detections,
-            "plates": plates
-        }
+    except Exception as e:
+        print(f"Detection error: {e}")
+        return {"image": None, "detections": 0, "plates": [], "error": str(e)}
+
+
+@app.post("/detect_raw")
+async def detect_raw(request: Request):
+    """
+    Same as /detect, but the request body is the raw JPEG
+    (application/octet-stream or image/jpeg) instead of base64 JSON.
+    """
+    try:
+        image_bytes = await request.body()
+        return await asyncio.to_thread(_process_bytes, image_bytes)
         
     except Exception as e:
         print(f"Detection error: {e}")
         return {"image": None, "detections": 0, "plates": [], "error": str(e)}
 
 
+@app.websocket("/ws/detect")
+async def detect_ws(websocket: WebSocket):
+    """
+    Stream frames over a WebSocket without base64 or per-frame HTTP overhead.
+    Each binary JPEG frame is answered with the annotated JPEG (binary,
+    empty if the frame could not be decoded) and then a JSON message with
+    the detection count and plate info. A text frame closes the connection
+    with 1003 once the frames before it have been answered.
+    
+    Receiving, inference and encode/send run as separate stages joined by
+    small bounded queues, so frame N+1 is already being inferred while
+    frame N is encoded and sent.
+    """
+    await websocket.accept()
+    
+    frames: asyncio.Queue = asyncio.Queue(maxsize=2)
+    replies: asyncio.Queue = asyncio.Queue(maxsize=2)
+    
+    # Skip state is per connection so a client only ever gets its own frames back
+    gate = FrameSkipGate()
+    
+    # Encodes still in flight, so teardown can cancel and reap them
+    encodes: set = set()
+    
+    async def receive() -> Optional[int]:
+        """Queue binary frames; returns a close code if the client broke protocol."""
+        close_code = None
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is None:
+                close_code = 1003  # Unsupported data: only binary JPEG frames are accepted
+                break
+            await frames.put(message["bytes"])
+        await frames.put(None)  # Sentinel: no more frames
+        return close_code
+    
+    async def infer():
+        while True:
+            image_bytes = await frames.get()
+            if image_bytes is None:
+                await replies.put(None)
+                return
+            
+            cached = gate.cached()
+            if cached is not None:
+                skipped = asyncio.get_running_loop().create_future()
+                skipped.set_result(cached)
+                await replies.put((skipped, 0, []))
+                continue
+            
+            try:
+                annotated, num_detections, plates = await asyncio.to_thread(_annotate_frame, image_bytes, gate)
+            except Exception as e:
+                print(f"Detection error: {e}")
+                annotated, num_detections, plates = None, 0, []
+            
+            # Start the encode now; the sender only waits on it right before sending
+            encode = None
+            if annotated is not None:
+                encode = asyncio.create_task(asyncio.to_thread(_encode_frame, annotated, gate))
+                encodes.add(encode)
+                encode.add_done_callback(encodes.discard)
+            await replies.put((encode, num_detections, plates))
+    
+    async def send():
+        while True:
+            reply = await replies.get()
+            if reply is None:
+                return
+            
+            encode, num_detections, plates = reply
+            buffer = await encode if encode is not None else None
+            await websocket.send_bytes(bytes(buffer) if buffer is not None else b"")
+            await websocket.send_json({"detections": num_detections, "plates": plates})
+    
+    stages = [asyncio.create_task(stage()) for stage in (receive, infer, send)]
+    try:
+        close_code, _, _ = await asyncio.gather(*stages)
+        if close_code is not None:
+            await websocket.close(code=close_code)
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"WebSocket stream error: {e}")
+        try:
+            await websocket.close(code=1011)
+        except Exception:
+            pass  # Already closed
+    finally:
+        # Reap every stage and pending encode so none outlives the connection
+        for task in (*stages, *encodes):
+            task.cancel()
+        await asyncio.gather(*stages, *encodes, return_exceptions=True)
+
+
 def main():
     """Run the detection viewer server on port 8001."""
     print("=" * 50)
@@ -23,6 +23,9 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8000,
         reload=settings.debug,
-        log_level="info"
+        log_level="info",
+        # loop/http left on "auto": uvloop + httptools wherever uvicorn[standard]
+        # installs them (not on Windows)
+        workers=1 if settings.debug else settings.workers
     )
 